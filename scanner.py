@@ -59,12 +59,28 @@ import pandas as pd
 import twstock
 import json
 import os
-import math
 import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time as dt_time, timedelta
 import pytz
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    # 未安裝 numba 時退回純 Python 執行，判定邏輯完全相同
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]): return args[0]
+        return lambda func: func
+
 # ==========================================
 # 1. 資料庫管理
 # ==========================================
@@ -72,9 +88,16 @@ DB_INDUSTRY = 'cmoney_industry_cache.json'
 DB_HISTORY = 'history.json'
 DATA_JSON = 'data.json'
 
+TW_TZ = pytz.timezone('Asia/Taipei')
+MARKET_OPEN = dt_time(9, 0, 0)
+MARKET_CLOSE = dt_time(13, 30, 0)
+
 def load_json(filename):
     if os.path.exists(filename):
         try:
+            if orjson is not None:
+                with open(filename, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(filename, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except:
@@ -82,8 +105,20 @@ def load_json(filename):
     return {}
 
 def save_json(filename, data):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """
+    data.json / history.json / 產業快取都會被 workflow commit 回 repo，一律以 2 格縮排輸出，保持逐筆可讀的 diff。
+    有安裝 orjson 時直接序列化成 bytes，否則退回標準 json。
+    先寫入暫存檔再以 os.replace 原子替換，寫到一半中斷也不會留下損毀的 JSON。
+    """
+    tmp = filename + '.tmp'
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+    else:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, filename)
 
 # ==========================================
 # 2. 產業分類解析邏輯
@@ -98,324 +133,354 @@ def get_stock_group(code, db_data):
             elif 'industry' in raw_data: group = raw_data['industry']
         elif isinstance(raw_data, str):
             group = raw_data
-    elif code in twstock.codes:
-        if code in twstock.codes and twstock.codes[code].group:
-            group = twstock.codes[code].group.replace("工業", "").replace("業", "")
+    else:
+        info = twstock.codes.get(code)
+        if info is not None and info.group:
+            group = info.group.replace("工業", "").replace("業", "")
     
     if not isinstance(group, str): group = str(group)
     return group
 
 def get_all_tickers():
-    twse = twstock.twse
-    tpex = twstock.tpex
-    ticker_list = []
-    for code in twse:
-        if len(code) == 4: ticker_list.append(f"{code}.TW")
-    for code in tpex:
-        if len(code) == 4: ticker_list.append(f"{code}.TWO")
-    return ticker_list
+    return ([f"{code}.TW" for code in twstock.twse if len(code) == 4] +
+            [f"{code}.TWO" for code in twstock.tpex if len(code) == 4])
 
 # ==========================================
 # 3. 策略邏輯 (V59.3)
 # ==========================================
 
-def check_strategy_original(df):
+# 策略用到的收盤均線 (視窗, 往前推幾根 K 棒)，順序即 TickerFeatures.means 的前段，核心依同樣順序拆解
+CLOSE_MEANS = np.array([
+    (5, 0), (10, 0), (12, 0), (20, 0), (60, 0), (120, 0),
+    (150, 0), (200, 0), (240, 0), (300, 0), (200, 19),
+], dtype=np.int64)
+# 成交量均線 (5 日、20 日)，接在收盤均線之後
+VOLUME_MEANS = np.array([(5, 0), (20, 0)], dtype=np.int64)
+
+# 每檔股票只準備一次的特徵：OHLCV 的 C 連續陣列與策略所需的尾端均值，三個策略共用
+TickerFeatures = namedtuple('TickerFeatures', ['close', 'open', 'high', 'low', 'volume', 'means'])
+
+if HAS_NUMBA:
+    @njit('float64[::1](float64[::1], int64[:, ::1])', cache=True)
+    def _tail_means(a, specs):
+        """
+        單次走訪序列，取得 specs 每列 (視窗 w, 往前推 lag 根) 的 w 日均值，與 pandas rolling(w).mean() 逐位元相同。
+        策略門檻常剛好落在 tick 價位上 (如收盤 == MA12)，差 1 ulp 就會讓判定翻轉，
+        而前綴和相減或只加總視窗都與 pandas 的結果有 ulp 級差異，因此照 pandas 的作法從序列開頭滾動：
+        每個視窗的加入 / 移除各自做 Kahan 補償，連續相同數值涵蓋整個視窗時直接回傳該值。K 棒不足的視窗為 NaN。
+        """
+        n = a.shape[0]
+        k = specs.shape[0]
+        out = np.full(k, np.nan)
+        total = np.zeros(k)
+        comp_add = np.zeros(k)
+        comp_remove = np.zeros(k)
+        nobs = np.zeros(k, dtype=np.int64)
+        neg_ct = np.zeros(k, dtype=np.int64)
+        prev = a[0]
+        same_ct = 0
+        for i in range(n):
+            x = a[i]
+            if x == prev:
+                same_ct += 1
+            else:
+                same_ct = 1
+            prev = x
+            for j in range(k):
+                w = specs[j, 0]
+                if i >= w:
+                    r = a[i - w]
+                    nobs[j] -= 1
+                    y = -r - comp_remove[j]
+                    t = total[j] + y
+                    comp_remove[j] = t - total[j] - y
+                    total[j] = t
+                    if r < 0: neg_ct[j] -= 1
+                nobs[j] += 1
+                y = x - comp_add[j]
+                t = total[j] + y
+                comp_add[j] = t - total[j] - y
+                total[j] = t
+                if x < 0: neg_ct[j] += 1
+
+                if i == n - 1 - specs[j, 1] and i >= w - 1:
+                    if same_ct >= nobs[j]:
+                        out[j] = x
+                    else:
+                        m = total[j] / nobs[j]
+                        if (neg_ct[j] == 0 and m < 0) or (neg_ct[j] == nobs[j] and m > 0): m = 0.0
+                        out[j] = m
+        return out
+else:
+    def _tail_means(a, specs):
+        # 純 Python 逐筆滾動太慢，直接交給 pandas rolling (本來就是要逐位元對齊的基準)
+        s = pd.Series(a)
+        return np.array([s.rolling(int(w)).mean().iloc[-1 - int(lag)] for w, lag in specs])
+
+def precompute_features(ohlcv):
+    # ohlcv 為單一股票的 (欄位, T) 陣列，欄位順序同 REQUIRED_COLS
+    # 核心簽章要求可寫入的 C 連續陣列；batch_ohlcv 產生的每一列本身即連續，通常不需額外複製
+    close, volume, low, high, open_ = (np.ascontiguousarray(row) for row in ohlcv)
+    # 收盤與成交量各走訪一次即算完所有均線，A/B 與 C 兩個核心直接讀取，不再各自重算
+    means = tuple(_tail_means(close, CLOSE_MEANS).tolist() + _tail_means(volume, VOLUME_MEANS).tolist())
+    return TickerFeatures(close=close, open=open_, high=high, low=low, volume=volume, means=means)
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _minmax(a):
+        """單次走訪同時取得最小與最大值，記憶體只讀一遍"""
+        lo = a[0]
+        hi = a[0]
+        for i in range(1, a.shape[0]):
+            x = a[i]
+            if x < lo: lo = x
+            if x > hi: hi = x
+        return lo, hi
+else:
+    def _minmax(a):
+        # 純 Python 迴圈反而較慢，退回兩次 NumPy C 迴圈
+        return a.min(), a.max()
+
+@njit(cache=True)
+def _calc_retrace(close, w):
+    """近 w 根收盤的回檔幅度 (peak - trough) / peak"""
+    trough, peak = _minmax(close[close.shape[0] - w:])
+    return (peak - trough) / peak if peak > 0 else 1.0
+
+# 明確簽章：import 時即編譯並寫入 __pycache__，之後每次排程執行直接讀取快取，不再有首次呼叫的編譯延遲
+@njit(
+    'Tuple((boolean, boolean, float64, float64, float64, float64, float64, float64, float64, float64))'
+    '(float64[::1], float64[::1], float64[::1], float64[::1], float64[::1], UniTuple(float64, 13))',
+    cache=True,
+)
+def _evaluate_strategies_ab(close, open_, high, low, volume, means):
     """
-    策略 A：拉回佈局 (含交易日扣抵值過濾)
+    策略 A (拉回佈局) 與策略 B (Strict VCP) 的融合核心。
+    均線一律取自 precompute_features 算好的尾端均值 (與 pandas rolling 逐位元相同)，核心內不再重算。
+    回傳 (match_a, match_b, price, ma5, ma10, ma20, ma150, ma200, ma300, bb_width)
     """
-    if len(df) < 310: return False, None
-    
-    close = df['Close']
-    open_p = df['Open']
-    high = df['High'] 
-    volume = df['Volume']
-    low = df['Low']
-    
-    ma5 = close.rolling(5).mean()
-    ma10 = close.rolling(10).mean()
-    ma12 = close.rolling(12).mean()
-    ma20 = close.rolling(20).mean()
-    ma60 = close.rolling(60).mean()
-    ma120 = close.rolling(120).mean()
-    ma240 = close.rolling(240).mean()
-    ma300 = close.rolling(300).mean()
-    
-    vol_ma5 = volume.rolling(5).mean()
-    
-    curr_c = float(close.iloc[-1])
-    curr_o = float(open_p.iloc[-1])
-    curr_h = float(high.iloc[-1])
-    curr_v = float(volume.iloc[-1])
-    curr_l = float(low.iloc[-1])
-    
-    prev_c = float(close.iloc[-2])
-    prev_l = float(low.iloc[-2])
-    
-    curr_ma5 = float(ma5.iloc[-1])
-    curr_ma10 = float(ma10.iloc[-1])
-    curr_ma12 = float(ma12.iloc[-1])
-    curr_ma20 = float(ma20.iloc[-1])
-    curr_ma60 = float(ma60.iloc[-1])
-    curr_ma120 = float(ma120.iloc[-1]) 
-    curr_ma240 = float(ma240.iloc[-1])
-    curr_ma300 = float(ma300.iloc[-1])
-    
-    curr_vol_ma5 = float(vol_ma5.iloc[-1])
-
-    # === 0. 風控排除 ===
+    no_match = (False, False, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    n = close.shape[0]
+    if n < 310: return no_match
+
+    (ma5, ma10, ma12, ma20, ma60, ma120, ma150, ma200, ma240, ma300, ma200_prev,
+     vol_ma5, vol_ma20) = means
+
+    curr_c = close[n - 1]
+    curr_o = open_[n - 1]
+    curr_h = high[n - 1]
+    curr_l = low[n - 1]
+    curr_v = volume[n - 1]
+    prev_c = close[n - 2]
+    prev_l = low[n - 2]
+
+    # === 0. 風控排除 (兩策略皆適用) ===
     upper_shadow = curr_h - max(curr_c, curr_o)
     lower_shadow = min(curr_c, curr_o) - curr_l
-    if (upper_shadow / curr_c > 0.002) and (lower_shadow / curr_c < 0.001): return False, None
-    if prev_l > 0 and (prev_l - curr_l) / prev_l > 0.015: return False, None
-    deduction_20 = float(close.iloc[-20])
-    if curr_c < deduction_20: return False, None
-
-    # === 1. 基本過濾 ===
-    if math.isnan(curr_ma300): return False, None 
-    if curr_c < curr_ma300: return False, None    
-    if curr_vol_ma5 < 1000000: return False, None 
-
-    # === 2. 策略核心 ===
-    if curr_c <= curr_ma120 or curr_c <= curr_ma60: return False, None
-    if math.isnan(curr_ma240): return False, None
-    if not (curr_ma10 > curr_ma60 > curr_ma120 > curr_ma240): return False, None
-    
-    bias_ma60 = (curr_c - curr_ma60) / curr_ma60
-    if bias_ma60 >= 0.25: return False, None
-    
-    mas = [curr_ma5, curr_ma10, curr_ma20]
-    ma_divergence = (max(mas) - min(mas)) / min(mas)
-    if ma_divergence >= 0.08: return False, None
-    
-    if curr_v >= curr_vol_ma5: return False, None
-    if curr_c <= curr_ma12: return False, None
-    
-    daily_range_pct = (curr_h - curr_l) / prev_c
-    if daily_range_pct >= 0.045: return False, None
-    entity_pct = abs(curr_c - curr_o) / prev_c
-    if entity_pct >= 0.025: return False, None
-
-    return True, {
-        "tag": "拉回佈局",
-        "price": round(curr_c, 2),
-        "ma5": round(close.rolling(5).mean().iloc[-1], 2),
-        "ma10": round(curr_ma10, 2),
-        "ma20": round(curr_ma20, 2),
-        "ma300": round(curr_ma300, 2)
-    }
-
-def check_strategy_vcp_pro(df):
+    if (upper_shadow / curr_c > 0.002) and (lower_shadow / curr_c < 0.001): return no_match
+    if prev_l > 0 and (prev_l - curr_l) / prev_l > 0.015: return no_match
+    if curr_c < close[n - 20]: return no_match
+
+    # === 1. 兩策略共同的硬門檻：多數個股在此即淘汰，不必再掃描後面的視窗 ===
+    if curr_c < ma300: return no_match
+    # A 需 5日均量 >= 1000 張、B 需當日量 >= 1000 張，兩者皆不成立即無望
+    if vol_ma5 < 1000000 and curr_v < 1000000: return no_match
+    if curr_c <= ma60: return no_match
+    if not (ma60 > ma120 > ma240): return no_match
+
+    # === 策略 A：拉回佈局 ===
+    mas_max = max(ma5, ma10, ma20)
+    mas_min = min(ma5, ma10, ma20)
+    match_a = (
+        vol_ma5 >= 1000000
+        and curr_c > ma120
+        and ma10 > ma60
+        and (curr_c - ma60) / ma60 < 0.25             # 乖離率
+        and (mas_max - mas_min) / mas_min < 0.08      # 均線糾結
+        and curr_v < vol_ma5                          # 量縮整理
+        and curr_c > ma12
+        and (curr_h - curr_l) / prev_c < 0.045        # 振幅
+        and abs(curr_c - curr_o) / prev_c < 0.025     # 實體
+    )
+
+    # === 策略 B：Strict VCP (先做純量條件，通過才掃描視窗) ===
+    bb_width = 0.0
+    match_b = (
+        curr_v >= 1000000
+        and curr_c >= ma200
+        and ma200 > ma200_prev                        # MA200 較 20 日前上揚
+        and curr_c >= ma150
+        and curr_c >= ma20 * 0.98
+        and vol_ma5 <= vol_ma20
+        and vol_ma5 >= 300000
+    )
+    if match_b:
+        low_52w, high_52w = _minmax(close[n - 250:])
+        # 布林帶寬度 (樣本標準差, ddof=1)：只看最後 20 根，不需整段 rolling
+        dev = close[n - 20:] - ma20
+        bb_width = 4.0 * np.sqrt((dev * dev).sum() / 19.0) / ma20
+        match_b = (
+            curr_c >= low_52w * 1.3
+            and curr_c >= high_52w * 0.75
+            and bb_width <= 0.15
+        )
+    if match_b:
+        r1 = _calc_retrace(close, 60)
+        r2 = _calc_retrace(close, 20)
+        r3 = _calc_retrace(close, 10)
+        match_b = r1 > r2 > r3
+
+    return (match_a, match_b, curr_c, ma5, ma10, ma20, ma150, ma200, ma300, bb_width)
+
+def check_strategies_ab(feat):
     """
-    策略 B：Strict VCP
+    策略 A：拉回佈局 (含交易日扣抵值過濾) / 策略 B：Strict VCP
+    兩策略由同一次核心計算判定，回傳 ((is_match_a, info_a), (is_match_b, info_b))
     """
-    try:
-        close = df['Close']
-        open_p = df['Open']
-        high = df['High']
-        low = df['Low']
-        volume = df['Volume']
-
-        if len(close) < 310: return False, None
-
-        ma10 = close.rolling(10).mean()
-        ma20 = close.rolling(20).mean()
-        ma50 = close.rolling(50).mean()
-        ma150 = close.rolling(150).mean()
-        ma200 = close.rolling(200).mean()
-        ma60 = close.rolling(60).mean()
-        ma300 = close.rolling(300).mean()
-        
-        ma120 = close.rolling(120).mean()
-        ma240 = close.rolling(240).mean()
-        
-        std20 = close.rolling(20).std()
-        bb_upper = ma20 + (std20 * 2)
-        bb_lower = ma20 - (std20 * 2)
-        bb_width = (bb_upper - bb_lower) / ma20
-
-        curr_c = float(close.iloc[-1])
-        curr_o = float(open_p.iloc[-1])
-        curr_h = float(high.iloc[-1])
-        curr_l = float(low.iloc[-1])
-        curr_v = float(volume.iloc[-1])
-
-        prev_l = float(low.iloc[-2])
-
-        curr_ma20 = float(ma20.iloc[-1])
-        curr_ma50 = float(ma50.iloc[-1])
-        curr_ma150 = float(ma150.iloc[-1])
-        curr_ma200 = float(ma200.iloc[-1])
-        curr_ma60 = float(ma60.iloc[-1])
-        curr_ma300 = float(ma300.iloc[-1])
-        
-        curr_ma120 = float(ma120.iloc[-1])
-        curr_ma240 = float(ma240.iloc[-1])
-        
-        curr_bb_width = float(bb_width.iloc[-1])
-
-        # === 0. 風控排除 ===
-        upper_shadow = curr_h - max(curr_c, curr_o)
-        lower_shadow = min(curr_c, curr_o) - curr_l
-        if (upper_shadow / curr_c > 0.002) and (lower_shadow / curr_c < 0.001): return False, None
-        if prev_l > 0 and (prev_l - curr_l) / prev_l > 0.015: return False, None
-        deduction_20 = float(close.iloc[-20])
-        if curr_c < deduction_20: return False, None
-
-        if math.isnan(curr_ma300) or curr_c < curr_ma300: return False, None
-        if math.isnan(curr_ma60) or curr_c <= curr_ma60: return False, None
-        if math.isnan(curr_ma120) or math.isnan(curr_ma240): return False, None
-        if not (curr_ma60 > curr_ma120 > curr_ma240): return False, None
-        if curr_v < 1000000: return False, None
-
-        if curr_c < curr_ma200: return False, None
-        if curr_ma200 <= float(ma200.iloc[-20]): return False, None
-        if curr_c < curr_ma150: return False, None
-
-        high_52w = close.iloc[-250:].max()
-        low_52w = close.iloc[-250:].min()
-        if curr_c < low_52w * 1.3: return False, None
-        if curr_c < high_52w * 0.75: return False, None
-
-        if curr_bb_width > 0.15: return False, None
-        if curr_c < curr_ma20 * 0.98: return False, None
-
-        vol_ma5 = volume.rolling(5).mean()
-        vol_ma20 = volume.rolling(20).mean()
-        if float(vol_ma5.iloc[-1]) > float(vol_ma20.iloc[-1]): return False, None
-        if float(vol_ma5.iloc[-1]) < 300000: return False, None
-
-        def calc_retrace(series):
-            peak = series.max()
-            trough = series.min()
-            return (peak - trough) / peak if peak > 0 else 1.0
-
-        r1 = calc_retrace(close.iloc[-60:])
-        r2 = calc_retrace(close.iloc[-20:])
-        r3 = calc_retrace(close.iloc[-10:])
-        
-        if not (r1 > r2 > r3): return False, None
+    (match_a, match_b, price, ma5, ma10, ma20,
+     ma150, ma200, ma300, bb_width) = _evaluate_strategies_ab(
+        feat.close, feat.open, feat.high, feat.low, feat.volume, feat.means
+    )
+    # 沒有 numba 時核心回傳 np.float64，round() 會改走 NumPy 的捨入；先轉回 Python float，輸出與原版一致
+    price, ma5, ma10, ma20, ma150, ma200, ma300, bb_width = (
+        float(v) for v in (price, ma5, ma10, ma20, ma150, ma200, ma300, bb_width)
+    )
+    # 唯獨原版的 ma5 (A/B) 與 ma10 (B) 是直接對 rolling().mean().iloc[-1] (np.float64) 取 round，保留 NumPy 的捨入
+    np_ma5 = float(np.round(ma5, 2))
+    np_ma10 = float(np.round(ma10, 2))
+
+    result_a = (False, None)
+    if match_a:
+        result_a = (True, {
+            "tag": "拉回佈局",
+            "price": round(price, 2),
+            "ma5": np_ma5,
+            "ma10": round(ma10, 2),
+            "ma20": round(ma20, 2),
+            "ma300": round(ma300, 2)
+        })
+
+    result_b = (False, None)
+    if match_b:
+        result_b = (True, {
+            "tag": "Strict-VCP",
+            "price": round(price, 2),
+            "ma5": np_ma5,
+            "ma10": np_ma10,
+            "ma20": round(ma20, 2),
+            "ma150": round(ma150, 2),
+            "ma200": round(ma200, 2),
+            "ma300": round(ma300, 2),
+            "bb_width": round(bb_width * 100, 1)
+        })
+
+    return result_a, result_b
+
+
+@njit(
+    'Tuple((boolean, float64, float64, float64, float64, float64))'
+    '(float64[::1], float64[::1], float64[::1], float64[::1], UniTuple(float64, 13))',
+    cache=True,
+)
+def _evaluate_n_shape(close, high, low, volume, means):
+    """
+    策略 C 的核心判定，回傳 (match, price, ma5, ma10, ma20, ma300)。
+    K 棒不足 300 根時 ma300 回傳 0.0。
+    """
+    no_match = (False, 0.0, 0.0, 0.0, 0.0, 0.0)
+    n = close.shape[0]
+    if n < 250: return no_match
+
+    curr_c = close[n - 1]
+    curr_v = volume[n - 1]
+    prev_v = volume[n - 2] # 取得昨日成交量
+
+    # 均線取自 precompute_features，順序同 CLOSE_MEANS + VOLUME_MEANS
+    (curr_ma5, curr_ma10, _, curr_ma20, curr_ma60, curr_ma120, _, _, curr_ma240, curr_ma300, _,
+     vol_ma5, _) = means
+
+    # ==========================================
+    # 🛡️ 條件零：絕對多頭排列
+    # ==========================================
+    if curr_c < curr_ma240: return no_match
+    if not (curr_ma60 > curr_ma120): return no_match
+
+    # ==========================================
+    # 🎯 條件一：找出 N 字形的「左側高點 (近期前高)」與「底部回檔」
+    # ==========================================
+    highs_window = high[n - 30:n - 3]
+    peak_pos_in_slice = np.argmax(highs_window)
+    peak_high = highs_window[peak_pos_in_slice]
+    peak_abs_pos = n - 30 + peak_pos_in_slice
+
+    pullback_zone = low[peak_abs_pos:n - 1]
+    if pullback_zone.shape[0] < 2: return no_match
+    pullback_low = pullback_zone.min()
+
+    # ==========================================
+    # ⭐ 條件二：創歷史新高位階確認
+    # ==========================================
+    historical_high = high.max()
+    if peak_high < historical_high * 0.97: return no_match
+
+    # ==========================================
+    # 🎯 條件三：有實質洗盤回檔 (高低點落差至少大於 8%)
+    # ==========================================
+    if pullback_low <= 0: return no_match
+    if peak_high / pullback_low < 1.08: return no_match
+
+    # ==========================================
+    # 🎯 條件四：柄部起漲 (放寬距離至 9%)
+    # ==========================================
+    # 今天的收盤價，必須距離前高在 -9% 到 +2% 以內，涵蓋了洗盤剛站上均線的甜蜜點
+    near_peak = (curr_c >= peak_high * 0.91) and (curr_c <= peak_high * 1.02)
+
+    # ==========================================
+    # 🎯 條件五：短線重回多頭
+    # ==========================================
+    short_trend_up = (curr_c > curr_ma5) and (curr_c > curr_ma10)
+
+    # ==========================================
+    # ⭐ 條件六：極致窒息量與防追高樞紐
+    # ==========================================
+    # 1. 乖離率 <= 2.5% (緊貼五日線)
+    ma5_bias = (curr_c - curr_ma5) / curr_ma5 if curr_ma5 > 0 else 1.0
+    not_overextended = ma5_bias <= 0.025
+    
+    # 2. 今日成交量必須 <= 昨日成交量的一半 (縮量 50% 以上)
+    volume_contraction = curr_v <= (prev_v * 0.5)
 
-    except Exception:
-        return False, None
+    # ==========================================
+    # 🎯 條件七：成交量基礎過濾
+    # ==========================================
+    if vol_ma5 < 800000: return no_match
 
-    return True, {
-        "tag": "Strict-VCP",
-        "price": round(curr_c, 2),
-        "ma5": round(close.rolling(5).mean().iloc[-1], 2),
-        "ma10": round(ma10.iloc[-1], 2),
-        "ma20": round(curr_ma20, 2),
-        "ma150": round(curr_ma150, 2),
-        "ma200": round(curr_ma200, 2),
-        "ma300": round(curr_ma300, 2),
-        "bb_width": round(curr_bb_width * 100, 1)
-    }
+    # 綜合判定
+    if near_peak and short_trend_up and not_overextended and volume_contraction:
+        return (True, curr_c, curr_ma5, curr_ma10, curr_ma20, curr_ma300 if n >= 300 else 0.0)
 
-def check_strategy_n_shape(df):
+    return no_match
+
+def check_strategy_n_shape(feat):
     """
     策略 C：N字形上攻 (V59.3 純粹窒息量樞紐版)
     專抓收盤價在兩年新高下緣 (放寬至9%)，且今日量縮一半以上、未大幅偏離 5MA 的蓄勢極品
     """
-    try:
-        if len(df) < 250: return False, None
-
-        close = df['Close']
-        high = df['High']
-        low = df['Low']
-        volume = df['Volume']
+    match, price, ma5, ma10, ma20, ma300 = _evaluate_n_shape(
+        feat.close, feat.high, feat.low, feat.volume, feat.means
+    )
+    if not match: return False, None
+    # 沒有 numba 時核心回傳 np.float64，round() 會改走 NumPy 的捨入；先轉回 Python float，輸出與原版一致
+    price, ma5, ma10, ma20, ma300 = float(price), float(ma5), float(ma10), float(ma20), float(ma300)
 
-        curr_c = float(close.iloc[-1])
-        curr_v = float(volume.iloc[-1])
-        prev_v = float(volume.iloc[-2]) # 取得昨日成交量
-        
-        ma5 = close.rolling(5).mean()
-        ma10 = close.rolling(10).mean()
-        ma20 = close.rolling(20).mean()
-        ma60 = close.rolling(60).mean()
-        ma120 = close.rolling(120).mean()
-        ma240 = close.rolling(240).mean()
-        ma300 = close.rolling(300).mean()
-
-        curr_ma5 = float(ma5.iloc[-1])
-        curr_ma10 = float(ma10.iloc[-1])
-        curr_ma20 = float(ma20.iloc[-1])
-        curr_ma60 = float(ma60.iloc[-1])
-        curr_ma120 = float(ma120.iloc[-1])
-        curr_ma240 = float(ma240.iloc[-1])
-        curr_ma300 = float(ma300.iloc[-1])
-
-        # ==========================================
-        # 🛡️ 條件零：絕對多頭排列
-        # ==========================================
-        if math.isnan(curr_ma240) or curr_c < curr_ma240: return False, None
-        if not (curr_ma60 > curr_ma120): return False, None
-
-        # ==========================================
-        # 🎯 條件一：找出 N 字形的「左側高點 (近期前高)」與「底部回檔」
-        # ==========================================
-        highs_window = high.iloc[-30:-3]
-        if len(highs_window) == 0: return False, None
-        
-        peak_high = float(highs_window.max())
-        peak_pos_in_slice = np.argmax(highs_window.values)
-        peak_abs_pos = len(df) - 30 + peak_pos_in_slice
-
-        pullback_zone = low.iloc[peak_abs_pos : -1]
-        if len(pullback_zone) < 2: return False, None
-        pullback_low = float(pullback_zone.min())
-
-        # ==========================================
-        # ⭐ 條件二：創歷史新高位階確認
-        # ==========================================
-        historical_high = float(high.max())
-        if peak_high < historical_high * 0.97: return False, None
-
-        # ==========================================
-        # 🎯 條件三：有實質洗盤回檔 (高低點落差至少大於 8%)
-        # ==========================================
-        if pullback_low <= 0: return False, None
-        if peak_high / pullback_low < 1.08: return False, None
-
-        # ==========================================
-        # 🎯 條件四：柄部起漲 (放寬距離至 9%)
-        # ==========================================
-        # 今天的收盤價，必須距離前高在 -9% 到 +2% 以內，涵蓋了洗盤剛站上均線的甜蜜點
-        near_peak = (curr_c >= peak_high * 0.91) and (curr_c <= peak_high * 1.02)
-
-        # ==========================================
-        # 🎯 條件五：短線重回多頭
-        # ==========================================
-        short_trend_up = (curr_c > curr_ma5) and (curr_c > curr_ma10)
-
-        # ==========================================
-        # ⭐ 條件六：極致窒息量與防追高樞紐
-        # ==========================================
-        # 1. 乖離率 <= 2.5% (緊貼五日線)
-        ma5_bias = (curr_c - curr_ma5) / curr_ma5 if curr_ma5 > 0 else 1.0
-        not_overextended = ma5_bias <= 0.025
-        
-        # 2. 今日成交量必須 <= 昨日成交量的一半 (縮量 50% 以上)
-        volume_contraction = curr_v <= (prev_v * 0.5)
-
-        # ==========================================
-        # 🎯 條件七：成交量基礎過濾
-        # ==========================================
-        vol_ma5 = float(volume.rolling(5).mean().iloc[-1])
-        if vol_ma5 < 800000: return False, None
-
-        # 綜合判定
-        if near_peak and short_trend_up and not_overextended and volume_contraction:
-            return True, {
-                "tag": "N字形",
-                "price": round(curr_c, 2),
-                "ma5": round(curr_ma5, 2),
-                "ma10": round(curr_ma10, 2),
-                "ma20": round(curr_ma20, 2),
-                "ma300": round(curr_ma300, 2) if not math.isnan(curr_ma300) else 0.0
-            }
-
-        return False, None
-    except Exception:
-        return False, None
+    return True, {
+        "tag": "N字形",
+        "price": round(price, 2),
+        "ma5": round(ma5, 2),
+        "ma10": round(ma10, 2),
+        "ma20": round(ma20, 2),
+        "ma300": round(ma300, 2)
+    }
 
 
 # ==========================================
@@ -462,24 +527,19 @@ def update_history_roi(history_db):
         print("⚠️ 無法取得歷史股價資料，跳過 ROI 更新。")
         return history_db
 
-    # Helper: 取得該股票的 Series
-    def get_stock_series(ticker_symbol, dataframe):
-        try:
-            target_col = None
-            if ticker_symbol in dataframe.columns:
-                target_col = ticker_symbol
-            elif ticker_symbol.split('.')[0] in dataframe.columns:
-                target_col = ticker_symbol.split('.')[0]
-            else:
-                simple_code = ticker_symbol.split('.')[0]
-                for col in dataframe.columns:
-                    if simple_code == str(col).split('.')[0]:
-                        target_col = col
-                        break
-            
-            if not target_col: return None
-            return dataframe[target_col].dropna()
-        except: return None
+    # 整張收盤價表一次轉成 NumPy，之後以欄位位置取值，不再逐檔建立 Series
+    close_arr = close_df.to_numpy(dtype=np.float64)
+    date_arr = close_df.index.to_numpy()
+    col_pos = {col: i for i, col in enumerate(close_df.columns)}
+
+    # Helper: 取得該股票的欄位位置
+    def get_stock_col(ticker_symbol):
+        simple_code = ticker_symbol.split('.')[0]
+        if ticker_symbol in col_pos: return col_pos[ticker_symbol]
+        if simple_code in col_pos: return col_pos[simple_code]
+        for col, i in col_pos.items():
+            if simple_code == str(col).split('.')[0]: return i
+        return None
 
     # Helper: 解析日期
     def parse_record_date(date_str):
@@ -489,68 +549,93 @@ def update_history_roi(history_db):
             except ValueError: continue
         return None
 
-    # 開始遍歷歷史紀錄
+    # 4. 里程碑鎖定 (基於 K 棒數)
+    targets = [
+        (1, 'perf_1d'),
+        (5, 'perf_5d'),
+        (10, 'perf_10d'),
+        (20, 'perf_20d'),
+        (60, 'perf_60d'),
+        (120, 'perf_120d')
+    ]
+
+    # 每檔股票只解析一次有效收盤序列 (日期, 收盤)，所有進場紀錄共用
+    series_map = {}
+    for symbol in tickers_to_check:
+        col = get_stock_col(symbol)
+        if col is None: continue
+        values = close_arr[:, col]
+        valid = ~np.isnan(values)
+        if valid.any():
+            series_map[symbol] = (date_arr[valid], values[valid])
+
+    # 攤平歷史紀錄為平行陣列：refs[i] 指回原本的 stock dict，計算完再寫回
+    refs, symbols, record_dates, buy_prices = [], [], [], []
     for date_str, stocks in history_db.items():
         record_date_obj = parse_record_date(date_str)
         if not record_date_obj: continue
         
-        # 將 datetime.date 轉為 pd.Timestamp 以便比對 Index
-        record_ts = pd.Timestamp(record_date_obj)
+        # 將 datetime.date 轉為 datetime64 以便比對 Index
+        record_ts = np.datetime64(record_date_obj, 'ns')
 
         for stock in stocks:
             symbol = stock['id'] + ('.TW' if stock['type'] == '上市' else '.TWO')
             buy_price = float(stock['buy_price'])
-            
-            series = get_stock_series(symbol, close_df)
-            if series is None or series.empty: continue
-
-            # 1. 找到進場日在 series 中的位置 (Index Location)
-            try:
-                start_idx = series.index.searchsorted(record_ts)
-                
-                if start_idx >= len(series): continue
-                
-                found_date = series.index[start_idx]
-                if (found_date - record_ts).days > 7: pass
+            if symbol not in series_map: continue
 
-            except Exception: continue
+            refs.append(stock)
+            symbols.append(symbol)
+            record_dates.append(record_ts)
+            buy_prices.append(buy_price)
 
-            # 2. 計算目前持有幾根 K 棒
-            current_idx = len(series) - 1
-            bars_held = current_idx - start_idx
-            
-            # 存回 stock 物件，方便前端參考
-            stock['days_held'] = int(bars_held) 
+    if not refs:
+        print("歷史績效更新完成 (K-Bar Based)。")
+        return history_db
 
-            # 3. 更新最新報價與 ROI
-            latest_price = float(series.iloc[-1])
-            roi = round(((latest_price - buy_price) / buy_price) * 100, 2)
-            
-            stock['latest_price'] = round(latest_price, 2)
-            stock['roi'] = roi
-            
-            if len(series) >= 2:
-                prev_price = float(series.iloc[-2])
-                stock['daily_change'] = round(((latest_price - prev_price) / prev_price) * 100, 2)
-
-            # 4. 里程碑鎖定 (基於 K 棒數)
-            targets = [
-                (1, 'perf_1d'),
-                (5, 'perf_5d'),
-                (10, 'perf_10d'),
-                (20, 'perf_20d'),
-                (60, 'perf_60d'),
-                (120, 'perf_120d')
-            ]
-
-            for bar_threshold, field_name in targets:
-                if bars_held >= bar_threshold:
-                    target_idx = start_idx + bar_threshold
-                    
-                    if target_idx < len(series):
-                        lock_price = float(series.iloc[target_idx])
-                        lock_roi = round(((lock_price - buy_price) / buy_price) * 100, 2)
-                        stock[field_name] = lock_roi
+    hist = pd.DataFrame({'symbol': symbols, 'record_ts': np.array(record_dates, dtype=date_arr.dtype)})
+    buy = np.array(buy_prices, dtype=np.float64)
+    n_records = len(refs)
+
+    start_idx = np.zeros(n_records, dtype=np.int64)
+    series_len = np.zeros(n_records, dtype=np.int64)
+    latest = np.full(n_records, np.nan)
+    prev = np.full(n_records, np.nan)
+    lock_prices = np.full((n_records, len(targets)), np.nan)
+
+    # 1. 找到進場日在 series 中的位置 (Index Location)，每檔股票一次向量化 searchsorted
+    for symbol, rows in hist.groupby('symbol').indices.items():
+        dates, values = series_map[symbol]
+        n = len(values)
+        pos = np.searchsorted(dates, hist['record_ts'].to_numpy()[rows])
+
+        start_idx[rows] = pos
+        series_len[rows] = n
+        latest[rows] = values[-1]
+        if n >= 2: prev[rows] = values[-2]
+
+        for k, (bar_threshold, _) in enumerate(targets):
+            target_idx = pos + bar_threshold
+            reached = target_idx < n
+            lock_prices[rows[reached], k] = values[target_idx[reached]]
+
+    # 2. 計算目前持有幾根 K 棒；3. ROI 與當日漲跌幅一次算完
+    bars_held = series_len - 1 - start_idx
+    roi = (latest - buy) / buy * 100
+    daily_change = (latest - prev) / prev * 100
+    lock_roi = (lock_prices - buy[:, None]) / buy[:, None] * 100
+
+    # 寫回 stock 物件 (進場日晚於最後一根 K 棒者略過)
+    for i in np.flatnonzero(start_idx < series_len):
+        stock = refs[i]
+        stock['days_held'] = int(bars_held[i])
+        stock['latest_price'] = round(float(latest[i]), 2)
+        stock['roi'] = round(float(roi[i]), 2)
+        if series_len[i] >= 2:
+            stock['daily_change'] = round(float(daily_change[i]), 2)
+
+        for k, (bar_threshold, field_name) in enumerate(targets):
+            if bars_held[i] >= bar_threshold:
+                stock[field_name] = round(float(lock_roi[i, k]), 2)
 
     print("歷史績效更新完成 (K-Bar Based)。")
     return history_db
@@ -558,9 +643,112 @@ def update_history_roi(history_db):
 # ==========================================
 # 5. 主程式
 # ==========================================
+REQUIRED_COLS = ['Close', 'Volume', 'Low', 'High', 'Open']  # batch_ohlcv 陣列的欄位順序，precompute_features 依此取用
+MIN_BARS = 250  # 策略 C 所需最少 K 棒數 (策略 A/B 需 310 根，由核心自行判斷)
+
+def batch_ohlcv(data, batch):
+    """
+    把批次下載結果 (欄位為 (Price, Ticker) 的欄式排列) 一次轉成 (N, 欄位, T) 的 float64 陣列，
+    並回傳 {ticker: 陣列索引}。無資料或缺欄位時回傳 (None, {})，整批略過。
+    整批皆缺值的列 (如非交易日) 先行移除，逐檔剔除缺值 K 棒時這些列本來就會被移除。
+    """
+    if data.empty: return None, {}
+    if isinstance(data.columns, pd.MultiIndex):
+        if not all(col in data.columns.get_level_values(0) for col in REQUIRED_COLS): return None, {}
+        tickers = list(data.columns.get_level_values(1).unique())
+        mats = [data[col].reindex(columns=tickers).to_numpy(dtype=np.float64) for col in REQUIRED_COLS]
+    else:
+        # 單檔下載時 yfinance 可能回傳單層欄位
+        if not all(col in data.columns for col in REQUIRED_COLS): return None, {}
+        tickers = batch[:1]
+        mats = [data[[col]].to_numpy(dtype=np.float64) for col in REQUIRED_COLS]
+
+    cube = np.stack(mats, axis=1)  # (T, 欄位, N)
+    cube = cube[~np.isnan(cube).all(axis=(1, 2))]
+    return np.ascontiguousarray(cube.transpose(2, 1, 0)), {t: j for j, t in enumerate(tickers)}
+
+def clean_ticker_ohlcv(ohlcv):
+    """
+    單一股票的 (欄位, T) 陣列：剔除任一欄缺值的 K 棒 (等同 dropna)。
+    K 棒不足或最後兩根收盤價非正 (無法算漲跌幅) 時回傳 None，由呼叫端直接略過，不靠例外控制流程。
+    """
+    valid = ~np.isnan(ohlcv).any(axis=0)
+    if not valid.all(): ohlcv = ohlcv[:, valid]
+    if ohlcv.shape[1] < MIN_BARS: return None
+    if (ohlcv[0, -2:] <= 0).any(): return None
+    return ohlcv
+
+PREFILTER_BARS = 240  # 批次預篩所需的尾端 K 棒數 (MA240)
+PREFILTER_EPS = 1e-6  # 預篩門檻放寬的相對誤差，避免與逐檔計算的浮點誤差造成誤刪
+
+def batch_prefilter(cube):
+    """
+    以整批 (N, 欄位, T) 陣列一次計算三個策略共同的必要條件：5 日均量 >= 30 萬、MA60 > MA120、收盤 >= MA240。
+    回傳長度 N 的布林陣列 (True 表示仍需逐檔判定)；尾端含缺值的股票無法與逐檔剔除後的結果對齊，一律保留。
+    """
+    if cube.shape[2] < PREFILTER_BARS: return np.ones(cube.shape[0], dtype=bool)
+
+    tail = cube[:, :, -PREFILTER_BARS:]
+    complete = ~np.isnan(tail).any(axis=(1, 2))
+    close, volume = tail[:, 0], tail[:, 1]
+
+    curr_c = close[:, -1]
+    ma60 = close[:, -60:].mean(axis=1)
+    ma120 = close[:, -120:].mean(axis=1)
+    ma240 = close.mean(axis=1)
+    vol_ma5 = volume[:, -5:].mean(axis=1)
+
+    with np.errstate(invalid='ignore'):
+        passed = (
+            (vol_ma5 >= 300000 * (1 - PREFILTER_EPS)) &
+            (ma60 > ma120 * (1 - PREFILTER_EPS)) &
+            (curr_c >= ma240 * (1 - PREFILTER_EPS))
+        )
+    return ~complete | passed
+
+BATCH_INTERVAL = 1.0  # 相鄰兩次下載「開始」之間的最短間隔 (秒)
+RETRY_DELAYS = (1.0, 2.0, 4.0, 8.0)  # 整批回傳空表 (多半是被 Yahoo 限流) 時的退避秒數
+
+def prefetch_batches(batches):
+    """
+    依序產出 (batch, future)，並由單一背景執行緒先行下載下一批，讓網路 I/O 與當批的策略判定重疊。
+    只用一個執行緒，同一時間最多一個請求在途，且最多只保留當批與下一批兩份資料。
+    節流以「兩次下載開始的間隔」計算，下載本身超過 BATCH_INTERVAL 時不再額外等待；
+    yfinance 不會對限流拋出例外，只會回傳空表，因此空表時依 RETRY_DELAYS 退避後重試。
+    一旦有一批重試用盡，視為持續限流，後續批次只下載一次不再重試，避免重複請求加重封鎖。
+    """
+    if not batches: return
+    last_start = None
+    retry_enabled = True
+
+    def download_batch(batch):
+        nonlocal last_start, retry_enabled
+        delays = RETRY_DELAYS if retry_enabled else ()
+        for delay in delays + (None,):
+            if last_start is not None:
+                wait = BATCH_INTERVAL - (time.monotonic() - last_start)
+                if wait > 0: time.sleep(wait)
+            last_start = time.monotonic()
+            data = yf.download(batch, period="2y", threads=True, progress=False, auto_adjust=True)
+            if data is not None and not data.empty: return data
+            if delay is None: break
+            time.sleep(delay)
+        if retry_enabled and delays:
+            retry_enabled = False
+            print("⚠️ 整批下載重試用盡 (疑似遭 Yahoo 限流)，後續批次不再重試。")
+        return data
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        current = pool.submit(download_batch, batches[0])
+        for k, batch in enumerate(batches):
+            upcoming = None
+            if k + 1 < len(batches):
+                upcoming = pool.submit(download_batch, batches[k + 1])
+            yield batch, current
+            current = upcoming
+
 def run_scanner():
-    tw_tz = pytz.timezone('Asia/Taipei')
-    now = datetime.now(tw_tz)
+    now = datetime.now(TW_TZ)
     
     industry_db = load_json(DB_INDUSTRY)
     history_db = load_json(DB_HISTORY)
@@ -575,91 +763,85 @@ def run_scanner():
     daily_results = []
     batch_size = 100 
     
-    for i in range(0, len(full_list), batch_size):
-        batch = full_list[i:i+batch_size]
+    batches = [full_list[i:i+batch_size] for i in range(0, len(full_list), batch_size)]
+    for batch_no, (batch, future) in enumerate(prefetch_batches(batches), 1):
         try:
-            data = yf.download(batch, period="2y", group_by='ticker', threads=True, progress=False, auto_adjust=True)
+            data = future.result()
+        except Exception as e:
+            print(f"Error downloading batch {batch_no}: {e}")
+            continue
+
+        if data is None or data.empty:
+            print(f"⚠️ Batch {batch_no} 下載結果為空，略過此批。")
+            continue
+
+        cube, index = batch_ohlcv(data, batch)
+        if cube is None: continue
+        candidates = batch_prefilter(cube)
+
+        for ticker in batch:
+            j = index.get(ticker)
+            if j is None or not candidates[j]: continue
+            ohlcv = clean_ticker_ohlcv(cube[j])
+            if ohlcv is None: continue
+            raw_code = ticker.split('.')[0]
+
+            feat = precompute_features(ohlcv)
+            (is_match_1, info_1), (is_match_2, info_2) = check_strategies_ab(feat)
+            is_match_3, info_3 = check_strategy_n_shape(feat)
             
-            for ticker in batch:
-                try:
-                    raw_code = ticker.split('.')[0]
-                    df = pd.DataFrame()
-                    if len(batch) > 1:
-                        if ticker in data.columns.levels[0]:
-                            df = data[ticker].copy()
-                    else:
-                        df = data.copy()
-                    
-                    df = df.dropna()
-                    if df.empty: continue
-                    if isinstance(df.columns, pd.MultiIndex):
-                        df.columns = df.columns.droplevel(0)
-
-                    required_cols = ['Close', 'Volume', 'Low', 'High', 'Open']
-                    if not all(col in df.columns for col in required_cols): continue
-
-                    is_match_1, info_1 = check_strategy_original(df)
-                    is_match_2, info_2 = check_strategy_vcp_pro(df)
-                    is_match_3, info_3 = check_strategy_n_shape(df)
-                    
-                    final_match = False
-                    final_info = {}
-                    strategy_tags = []
-
-                    if is_match_1:
-                        final_match = True
-                        final_info = info_1
-                        strategy_tags.append("拉回佈局")
-                    if is_match_2:
-                        final_match = True
-                        if not final_info: final_info = info_2
-                        strategy_tags.append("Strict-VCP")
-                    if is_match_3:
-                        final_match = True
-                        if not final_info: final_info = info_3
-                        strategy_tags.append("N字形")
+            final_match = False
+            final_info = {}
+            strategy_tags = []
+
+            if is_match_1:
+                final_match = True
+                final_info = info_1
+                strategy_tags.append("拉回佈局")
+            if is_match_2:
+                final_match = True
+                if not final_info: final_info = info_2
+                strategy_tags.append("Strict-VCP")
+            if is_match_3:
+                final_match = True
+                if not final_info: final_info = info_3
+                strategy_tags.append("N字形")
+            
+            if final_match:
+                name = raw_code
+                if raw_code in twstock.codes: name = twstock.codes[raw_code].name
+                group = get_stock_group(raw_code, industry_db)
+                if raw_code not in industry_db: industry_db[raw_code] = group
+                
+                # clean_ticker_ohlcv 已保證至少 MIN_BARS 根 K 棒且最後兩根收盤價為正
+                prev_c = float(feat.close[-2])
+                change_rate = round((final_info['price'] - prev_c) / prev_c * 100, 2)
                     
-                    if final_match:
-                        name = raw_code
-                        if raw_code in twstock.codes: name = twstock.codes[raw_code].name
-                        group = get_stock_group(raw_code, industry_db)
-                        if raw_code not in industry_db: industry_db[raw_code] = group
-                        
-                        try:
-                            prev_c = df['Close'].iloc[-2]
-                            change_rate = round((final_info['price'] - prev_c) / prev_c * 100, 2)
-                        except:
-                            change_rate = 0.0
-                            
-                        tags_str = " & ".join(strategy_tags)
-                        
-                        note_ma300 = round(final_info.get('ma300', 0), 2)
-                        note_str = f"{tags_str} / MA300 {note_ma300}"
-
-                        stock_entry = {
-                            "id": raw_code,
-                            "name": name,
-                            "group": group,
-                            "type": "上櫃" if ".TWO" in ticker else "上市",
-                            "price": final_info['price'], 
-                            "ma5": final_info['ma5'],
-                            "ma10": final_info['ma10'],
-                            "changeRate": change_rate,
-                            "isValid": True,
-                            "note": note_str,
-                            "buy_price": final_info['price'], 
-                            "latest_price": final_info['price'], 
-                            "roi": 0.0, 
-                            "daily_change": change_rate,
-                            "perf_1d": None, "perf_5d": None, "perf_10d": None,
-                            "perf_20d": None, "perf_30d": None, "perf_60d": None, "perf_120d": None
-                        }
-                        daily_results.append(stock_entry)
-                        print(f" -> Found: {raw_code} {name} [{tags_str}]")
-                        
-                except Exception: continue
-        except Exception: continue
-        time.sleep(1.0)
+                tags_str = " & ".join(strategy_tags)
+                
+                note_ma300 = round(final_info.get('ma300', 0), 2)
+                note_str = f"{tags_str} / MA300 {note_ma300}"
+
+                stock_entry = {
+                    "id": raw_code,
+                    "name": name,
+                    "group": group,
+                    "type": "上櫃" if ".TWO" in ticker else "上市",
+                    "price": final_info['price'], 
+                    "ma5": final_info['ma5'],
+                    "ma10": final_info['ma10'],
+                    "changeRate": change_rate,
+                    "isValid": True,
+                    "note": note_str,
+                    "buy_price": final_info['price'], 
+                    "latest_price": final_info['price'], 
+                    "roi": 0.0, 
+                    "daily_change": change_rate,
+                    "perf_1d": None, "perf_5d": None, "perf_10d": None,
+                    "perf_20d": None, "perf_30d": None, "perf_60d": None, "perf_120d": None
+                }
+                daily_results.append(stock_entry)
+                print(f" -> Found: {raw_code} {name} [{tags_str}]")
 
     save_json(DB_INDUSTRY, industry_db)
     
@@ -672,14 +854,12 @@ def run_scanner():
     save_json(DATA_JSON, data_payload)
 
     current_time = now.time()
-    market_open = dt_time(9, 0, 0)
-    market_close = dt_time(13, 30, 0)
-    is_market_session = market_open <= current_time <= market_close
+    is_market_session = MARKET_OPEN <= current_time <= MARKET_CLOSE
 
     if is_market_session:
         print(f"⚠️ 現在是盤中時間 ({current_time.strftime('%H:%M')})，跳過 History 新增歸檔。")
     else:
-        if current_time > market_close:
+        if current_time > MARKET_CLOSE:
             record_date_str = now.strftime("%Y/%m/%d")
         else:
             yesterday = now - timedelta(days=1)
@@ -688,10 +868,7 @@ def run_scanner():
         print(f"✅ 盤後時段，準備將新資料歸檔至 History: {record_date_str}")
         
         if daily_results:
-            existing_ids = set()
-            for date_key, stocks in history_db.items():
-                for s in stocks:
-                    existing_ids.add(s['id'])
+            existing_ids = {s['id'] for stocks in history_db.values() for s in stocks}
             
             unique_results = []
             for stock in daily_results: